@@ -1,198 +1,233 @@
-import re
-import logging
-import matplotlib.pyplot as plt
+import os
+import json
+import warnings
+import functools
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
+# PNGs only: draw on an Agg canvas directly, without pyplot or a GUI backend.
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import numpy as np
 
-# Enable detailed tracing. Set to False to disable verbose output.
-DEBUG = True
-logging.basicConfig(level=logging.INFO if DEBUG else logging.WARNING,
-                    format="%(message)s")
-
-# Read the complete file
-data = open("out.txt").read()
-if DEBUG:
-    logging.info("Loaded out.txt, length: %d characters", len(data))
-
-# Use two regex patterns to extract benchmarks.
-# The first captures Neo4j tests and the second captures Doublets tests.
-patterns = [
-    r"test\s+(\w+)/(Neo4j)_(\w+)\s+\.\.\.\s+bench:\s+(\d+)\s+ns/iter\s+\(\+/-\s+\d+\)",
-    r"test\s+(\w+)/(Doublets)_(\w+)_(\w+)\s+\.\.\.\s+bench:\s+(\d+)\s+ns/iter\s+\(\+/-\s+\d+\)"
-]
+try:
+    from numba import njit
+except ImportError:  # numba is optional; compute_ratios then uses plain NumPy
+    njit = None
 
-# Instead of using lists, we use dictionaries mapping operation names to values.
-Neo4j_Transaction = {}
-Neo4j_NonTransaction = {}
-Doublets_United_Volatile = {}
-Doublets_United_NonVolatile = {}
-Doublets_Split_Volatile = {}
-Doublets_Split_NonVolatile = {}
-
-# Process each regex pattern
-for pattern in patterns:
-    matches = re.findall(pattern, data)
-    if DEBUG:
-        logging.info("Pattern %s matched %d entries", pattern, len(matches))
-    for match in matches:
-        # Normalise name
-        op = match[0].replace("_", " ")  # Create, Each All, …
-        if match[1] == 'Neo4j':
-            # (operation, 'Neo4j', transaction, time)
-            transaction = match[2]
-            time_val = int(match[3])
-            if DEBUG:
-                logging.info("Neo4j %s - %s: %d ns", op, transaction, time_val)
-            if transaction == "Transaction":
-                Neo4j_Transaction[op] = time_val
-            else:
-                Neo4j_NonTransaction[op] = time_val
-        else:
-            # (operation, 'Doublets', trees, storage, time)
-            trees = match[2]
-            storage = match[3]
-            time_val = int(match[4])
-            if DEBUG:
-                logging.info("Doublets %s - %s %s: %d ns", op, trees, storage, time_val)
-            if trees == 'United':
-                if storage == 'Volatile':
-                    Doublets_United_Volatile[op] = time_val
-                else:
-                    Doublets_United_NonVolatile[op] = time_val
-            else:
-                if storage == 'Volatile':
-                    Doublets_Split_Volatile[op] = time_val
-                else:
-                    Doublets_Split_NonVolatile[op] = time_val
-
-# Operation order for table and plots
-ordered_ops = [
-    "Create", "Update", "Delete",
-    "Each All", "Each Identity", "Each Concrete", "Each Outgoing", "Each Incoming"
-]
+# Parsing lives in parse.py so it can run under PyPy: `pypy3 parse.py && python3 out.py`.
+# The DEBUG switch lives there too and also controls this script's tracing.
+from parse import (
+    _trace, BENCH_LOG, PARSED_JSON, ordered_ops, SERIES_NAMES,
+    NEO4J_TX, NEO4J_NONTX, DU_VOL, DU_NV, DS_VOL, DS_NV, parse_table,
+)
+
+DOUBLETS_SERIES = (DU_VOL, DU_NV, DS_VOL, DS_NV)
 
-if DEBUG:
-    logging.info("\nFinal dictionaries (after parsing):")
-    logging.info("Neo4j_Transaction: %s", Neo4j_Transaction)
-    logging.info("Neo4j_NonTransaction: %s", Neo4j_NonTransaction)
-    logging.info("Doublets_United_Volatile: %s", Doublets_United_Volatile)
-    logging.info("Doublets_United_NonVolatile: %s", Doublets_United_NonVolatile)
-    logging.info("Doublets_Split_Volatile: %s", Doublets_Split_Volatile)
-    logging.info("Doublets_Split_NonVolatile: %s", Doublets_Split_NonVolatile)
-
-# Assemble series in the desired order.
-def get_series(d): return [d.get(op, 0) for op in ordered_ops]
-
-du_volatile_arr   = get_series(Doublets_United_Volatile)
-du_nonvolatile_arr= get_series(Doublets_United_NonVolatile)
-ds_volatile_arr   = get_series(Doublets_Split_Volatile)
-ds_nonvolatile_arr= get_series(Doublets_Split_NonVolatile)
-neo4j_non_arr     = get_series(Neo4j_NonTransaction)
-neo4j_trans_arr   = get_series(Neo4j_Transaction)
+# ─────────────────────────────────────────────────────────────────────────────
+# Loading
+# ─────────────────────────────────────────────────────────────────────────────
+def read_parsed():
+    """Table rows from parsed.json, or None if it is missing, stale, unreadable or for other ops/series."""
+    if not os.path.exists(PARSED_JSON):
+        return None
+    if os.path.exists(BENCH_LOG) and os.path.getmtime(PARSED_JSON) < os.path.getmtime(BENCH_LOG):
+        return None
+    try:
+        with open(PARSED_JSON) as f:
+            parsed = json.load(f)
+        if parsed["ops"] != ordered_ops or parsed["series"] != SERIES_NAMES:
+            return None
+        return parsed["table"]
+    except (ValueError, KeyError):
+        return None
+
+@functools.lru_cache(maxsize=1)
+def load_series():
+    """Load the (series, op) table once; later calls reuse it."""
+    rows = read_parsed()
+    if rows is None:
+        _trace("%s not usable, parsing %s in-process", PARSED_JSON, BENCH_LOG)
+        rows = parse_table()
+    table = np.array(rows, dtype=np.int64)
+
+    # The ndarray is only rendered if the record is actually emitted.
+    _trace("\nFinal table (after parsing), rows %s, columns %s:\n%s",
+           SERIES_NAMES, ordered_ops, table)
+
+    return table
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Markdown Table
 # ─────────────────────────────────────────────────────────────────────────────
+HEADER = (
+    "| Operation     | Doublets United Volatile | Doublets United NonVolatile | "
+    "Doublets Split Volatile | Doublets Split NonVolatile | Neo4j NonTransaction | Neo4j Transaction |\n"
+    "|---------------|--------------------------|-----------------------------|-------------------------|----------------------------|----------------------|-------------------|"
+)
+# Column widths of one row: operation, four Doublets cells, two Neo4j cells.
+ROW_WIDTHS = (13, 24, 27, 23, 26, 20, 17)
+# Template for all rows below the header, specialised at import time for
+# len(ordered_ops) rows, so the whole body is filled by one format() call
+# over a flat, row-major list of cells.
+BODY_FMT = "\n".join(
+    "| " + " | ".join(f"{{{i * len(ROW_WIDTHS) + k}:<{w}}}" for k, w in enumerate(ROW_WIDTHS)) + " |"
+    for i in range(len(ordered_ops))
+)
+
+def compute_ratios_loop(table):
+    """Speedup of every Doublets cell over the fastest Neo4j result for its op.
+
+    Rows follow DOUBLETS_SERIES. A missing Neo4j result gives inf (no ratio),
+    a missing Doublets result gives nan.
+    """
+    n_ops = table.shape[1]
+    ratios = np.full((len(DOUBLETS_SERIES), n_ops), np.nan)
+    for j in range(n_ops):
+        min_neo = np.inf
+        for s in (NEO4J_NONTX, NEO4J_TX):
+            if 0 < table[s, j] < min_neo:
+                min_neo = table[s, j]
+        for k in range(len(DOUBLETS_SERIES)):
+            v = table[DOUBLETS_SERIES[k], j]
+            if v > 0:
+                ratios[k, j] = min_neo / v
+    return ratios
+
+def compute_ratios_numpy(table):
+    """Same result as compute_ratios_loop, vectorised for when numba is missing."""
+    neo      = table[[NEO4J_NONTX, NEO4J_TX]]
+    min_neo  = np.where(neo > 0, neo, np.inf).min(axis=0)
+    doublets = table[list(DOUBLETS_SERIES)]
+    return np.where(doublets > 0, min_neo / np.maximum(doublets, 1), np.nan)
+
+# The explicit loop only pays off once compiled.
+compute_ratios = (njit(cache=True, nogil=True)(compute_ratios_loop) if njit is not None
+                  else compute_ratios_numpy)
+
+def annotate(v, ratio):
+    if v == 0: return "N/A"
+    if np.isinf(ratio): return f"{v}"
+    return f"{v} ({ratio:.1f}x faster)"
+
 def print_results_markdown():
-    header = (
-        "| Operation     | Doublets United Volatile | Doublets United NonVolatile | "
-        "Doublets Split Volatile | Doublets Split NonVolatile | Neo4j NonTransaction | Neo4j Transaction |\n"
-        "|---------------|--------------------------|-----------------------------|-------------------------|----------------------------|----------------------|-------------------|"
-    )
-    lines = [header]
+    table = load_series()
 
+    doublets = table[list(DOUBLETS_SERIES)]
+    ratios = compute_ratios(table)
+
+    cells = []
     for i, op in enumerate(ordered_ops):
-        neo4j_val1 = neo4j_non_arr[i]   if neo4j_non_arr[i]   else float('inf')
-        neo4j_val2 = neo4j_trans_arr[i] if neo4j_trans_arr[i] else float('inf')
-        min_neo4j  = min(neo4j_val1, neo4j_val2)
-
-        def annotate(v):
-            if v == 0: return "N/A"
-            if min_neo4j == float('inf'): return f"{v}"
-            return f"{v} ({min_neo4j / v:.1f}x faster)"
-
-        row = (
-            f"| {op:<13} | {annotate(du_volatile_arr[i]):<24} | "
-            f"{annotate(du_nonvolatile_arr[i]):<27} | "
-            f"{annotate(ds_volatile_arr[i]):<23} | "
-            f"{annotate(ds_nonvolatile_arr[i]):<26} | "
-            f"{neo4j_non_arr[i] or 'N/A':<20} | {neo4j_trans_arr[i] or 'N/A':<17} |"
-        )
-        lines.append(row)
-
-    table_md = "\n".join(lines)
+        cells.append(op)
+        cells += [annotate(v, r) for v, r in zip(doublets[:, i], ratios[:, i])]
+        cells += [table[NEO4J_NONTX, i] or 'N/A', table[NEO4J_TX, i] or 'N/A']
+
+    table_md = HEADER + "\n" + BODY_FMT.format(*cells)
     print(table_md)
 
     # Save to file for CI to use
     with open("results.md", "w") as f:
         f.write(table_md)
 
-    if DEBUG: logging.info("\nGenerated Markdown Table:\n%s", table_md)
+    _trace("\nGenerated Markdown Table:\n%s", table_md)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Plots
 # ─────────────────────────────────────────────────────────────────────────────
+# Cheap rendering settings; bar charts gain nothing from finer paths.
+matplotlib.rcParams.update({"path.simplify": True, "path.simplify_threshold": 1.0, "savefig.dpi": 100})
+
+# Bars per operation, bottom to top: (series, label, color).
+PLOT_SERIES = [
+    (DU_VOL,      'Doublets United Volatile',    'salmon'),
+    (DU_NV,       'Doublets United NonVolatile', 'red'),
+    (DS_VOL,      'Doublets Split Volatile',     'lightgreen'),
+    (DS_NV,       'Doublets Split NonVolatile',  'green'),
+    (NEO4J_NONTX, 'Neo4j NonTransaction',        'lightblue'),
+    (NEO4J_TX,    'Neo4j Transaction',           'blue'),
+]
+
 def ensure_min_visible(arr, min_val):
     """Ensure non-zero values are at least min_val for visibility on graph."""
-    return [max(v, min_val) if v > 0 else 0 for v in arr]
+    return np.where(arr > 0, np.maximum(arr, min_val), 0)
+
+def draw_bars(ax, data):
+    """One barh call per series in PLOT_SERIES; data is indexed like the table."""
+    y, w = np.arange(len(ordered_ops)), 0.1
+    for i, (series_id, label, color) in enumerate(PLOT_SERIES):
+        ax.barh(y + (i - 2)*w, data[series_id], w, label=label, color=color)
+    ax.set_yticks(y); ax.set_yticklabels(ordered_ops)
 
-def bench1():
+def bench1(ax):
     """Horizontal bars – raw values (pixel scale)."""
-    y, w  = np.arange(len(ordered_ops)), 0.1
-    fig, ax = plt.subplots(figsize=(12, 8))
+    table = load_series()
 
     # Calculate maximum value across all data series to determine scale
-    all_values = (du_volatile_arr + du_nonvolatile_arr + ds_volatile_arr +
-                  ds_nonvolatile_arr + neo4j_non_arr + neo4j_trans_arr)
-    max_val = max(all_values) if all_values else 1
+    max_val = int(table.max())
 
     # Minimum visible bar width: ~0.5% of max value ensures at least 2 pixels
     # on typical 12-inch wide figure at 100 DPI (~900px plot area)
     min_visible = max_val * 0.005
-    if DEBUG:
-        logging.info("bench1: max_val=%d, min_visible=%d", max_val, min_visible)
+    _trace("bench1: max_val=%d, min_visible=%d", max_val, min_visible)
 
     # Apply minimum visibility to all data series
-    du_volatile_vis    = ensure_min_visible(du_volatile_arr, min_visible)
-    du_nonvolatile_vis = ensure_min_visible(du_nonvolatile_arr, min_visible)
-    ds_volatile_vis    = ensure_min_visible(ds_volatile_arr, min_visible)
-    ds_nonvolatile_vis = ensure_min_visible(ds_nonvolatile_arr, min_visible)
-    neo4j_non_vis      = ensure_min_visible(neo4j_non_arr, min_visible)
-    neo4j_trans_vis    = ensure_min_visible(neo4j_trans_arr, min_visible)
-
-    ax.barh(y - 2*w, du_volatile_vis,   w, label='Doublets United Volatile',   color='salmon')
-    ax.barh(y -   w, du_nonvolatile_vis,w, label='Doublets United NonVolatile',color='red')
-    ax.barh(y      , ds_volatile_vis,    w, label='Doublets Split Volatile',    color='lightgreen')
-    ax.barh(y +   w, ds_nonvolatile_vis, w, label='Doublets Split NonVolatile', color='green')
-    ax.barh(y + 2*w, neo4j_non_vis,      w, label='Neo4j NonTransaction',       color='lightblue')
-    ax.barh(y + 3*w, neo4j_trans_vis,    w, label='Neo4j Transaction',          color='blue')
+    draw_bars(ax, ensure_min_visible(table, min_visible))
 
     ax.set_xlabel('Time (ns)')
     ax.set_title ('Benchmark Comparison: Neo4j vs Doublets (Rust)')
-    ax.set_yticks(y); ax.set_yticklabels(ordered_ops); ax.legend()
-    fig.tight_layout(); plt.savefig("bench_rust.png"); plt.close(fig)
-    if DEBUG: logging.info("bench_rust.png saved.")
+    ax.legend()
 
-def bench2():
+def bench2(ax):
     """Horizontal bars – raw values on a log scale."""
-    y, w  = np.arange(len(ordered_ops)), 0.1
-    fig, ax = plt.subplots(figsize=(12, 8))
+    table = load_series()
 
-    ax.barh(y - 2*w, du_volatile_arr,   w, label='Doublets United Volatile',   color='salmon')
-    ax.barh(y -   w, du_nonvolatile_arr,w, label='Doublets United NonVolatile',color='red')
-    ax.barh(y      , ds_volatile_arr,    w, label='Doublets Split Volatile',    color='lightgreen')
-    ax.barh(y +   w, ds_nonvolatile_arr, w, label='Doublets Split NonVolatile', color='green')
-    ax.barh(y + 2*w, neo4j_non_arr,      w, label='Neo4j NonTransaction',       color='lightblue')
-    ax.barh(y + 3*w, neo4j_trans_arr,    w, label='Neo4j Transaction',          color='blue')
+    draw_bars(ax, table)
 
     ax.set_xlabel('Time (ns) – log scale')
     ax.set_title ('Benchmark Comparison: Neo4j vs Doublets (Rust)')
-    ax.set_yticks(y); ax.set_yticklabels(ordered_ops); ax.set_xscale('log'); ax.legend()
-    fig.tight_layout(); plt.savefig("bench_rust_log_scale.png"); plt.close(fig)
-    if DEBUG: logging.info("bench_rust_log_scale.png saved.")
+    ax.set_xscale('log'); ax.legend()
+
+# Each chart is saved from its own PANEL_W x PANEL_H inch panel of the shared figure.
+PANEL_W, PANEL_H = 12, 8
+
+def save_axes(fig, ax, path, bbox):
+    """Save the bbox region (in inches) holding ax, with the other axes hidden."""
+    others = [other for other in fig.axes if other is not ax]
+    for other in others: other.set_visible(False)
+    try:
+        fig.canvas.print_figure(path, dpi=matplotlib.rcParams["savefig.dpi"], bbox_inches=bbox)
+    finally:
+        for other in others: other.set_visible(True)
+    _trace("%s saved.", path)
+
+def plot_benches():
+    """Lay out both charts once in a shared figure and save each as its own PNG."""
+    panels = [(bench1, "bench_rust.png"), (bench2, "bench_rust_log_scale.png")]
+    # Start at panel size so tight_layout pads each chart as a standalone
+    # PANEL_W x PANEL_H figure, then widen and shift each chart into its panel.
+    fig = Figure(figsize=(PANEL_W, PANEL_H))
+    FigureCanvasAgg(fig)  # one Agg canvas (and pixel buffer) shared by both saves
+    layout = []
+    for bench, _ in panels:
+        gs = fig.add_gridspec(1, 1)
+        ax = fig.add_subplot(gs[0])
+        bench(ax)
+        # tight_layout warns about the other panels' axes (not in gs), but only
+        # lays out the axes in gs, which is exactly what is wanted here.
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", "This figure includes Axes that are not compatible", UserWarning)
+            gs.tight_layout(fig)
+        layout.append((gs, ax))
+
+    fig.set_size_inches(PANEL_W * len(panels), PANEL_H)
+    for i, (gs, ax) in enumerate(layout):
+        gs.update(left=(i + gs.left) / len(panels), right=(i + gs.right) / len(panels))
+        # GridSpec.update only moves axes of pyplot-managed figures.
+        ax.set_position(gs[0].get_position(fig))
+    for i, ((_, ax), (_, path)) in enumerate(zip(layout, panels)):
+        save_axes(fig, ax, path, Bbox.from_bounds(i * PANEL_W, 0, PANEL_W, PANEL_H))
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Run
 # ─────────────────────────────────────────────────────────────────────────────
 print_results_markdown()
-bench1()
-bench2()
+plot_benches()
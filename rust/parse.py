@@ -0,0 +1,95 @@
+import os
+import json
+import mmap
+import logging
+import contextlib
+
+try:  # RE2 matches in linear time; the stdlib engine accepts the same pattern
+    import re2 as re_engine
+except ImportError:
+    import re as re_engine
+
+# Parse stage of the bench report: pure Python, no NumPy/matplotlib, so it can
+# run under PyPy. Reads out.txt and writes the (series, op) table to parsed.json
+# for out.py to render.
+
+# Enable detailed tracing. Set to False to disable verbose output.
+DEBUG = True
+logging.basicConfig(level=logging.INFO if DEBUG else logging.WARNING,
+                    format="%(message)s")
+# Trace hook bound once: a no-op when DEBUG is off, so hot loops skip logging entirely.
+_trace = logging.info if DEBUG else (lambda *a, **k: None)
+
+BENCH_LOG   = "out.txt"
+PARSED_JSON = "parsed.json"
+
+# Compile a single benchmark pattern once, at import time. It matches raw
+# bytes, so out.txt is never decoded as a whole.
+# Tests are "<op>/<series>", e.g. "Each_All/Neo4j_Transaction" or
+# "Create/Doublets_United_Volatile"; the series is looked up in SERIES_IDS.
+BENCH_RE = re_engine.compile(
+    rb"test\s+(\w+)/((?:Neo4j|Doublets)_\w+)\s+\.\.\.\s+bench:\s+(\d+)\s+ns/iter"
+)
+
+# Operation order for table and plots
+ordered_ops = [
+    "Create", "Update", "Delete",
+    "Each All", "Each Identity", "Each Concrete", "Each Outgoing", "Each Incoming"
+]
+op_index = {name: i for i, name in enumerate(ordered_ops)}
+
+# Series are rows of a single (series, op) table; a zero cell means "no result".
+NEO4J_TX, NEO4J_NONTX, DU_VOL, DU_NV, DS_VOL, DS_NV = range(6)
+SERIES_NAMES = [
+    "Neo4j_Transaction", "Neo4j_NonTransaction",
+    "Doublets_United_Volatile", "Doublets_United_NonVolatile",
+    "Doublets_Split_Volatile", "Doublets_Split_NonVolatile",
+]
+# Test names spell spaces as underscores: Each_All -> Each All.
+_OP_TT = bytes.maketrans(b"_", b" ")
+# Exact series name (as captured from the log) -> table row.
+SERIES_IDS = {name.encode("ascii"): series_id for series_id, name in enumerate(SERIES_NAMES)}
+
+@contextlib.contextmanager
+def map_file(path):
+    """Map path read-only; an empty file (which mmap rejects) maps to b""."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+def parse_table(path=BENCH_LOG):
+    """Parse a cargo bench log into a (series, op) table of ns/iter ints."""
+    table = [[0] * len(ordered_ops) for _ in SERIES_NAMES]
+
+    # Scan the whole mapped log in one pass of the regex engine.
+    with map_file(path) as data:
+        matches = [m.groups() for m in BENCH_RE.finditer(data)]
+    for op_raw, series_raw, time_raw in matches:
+        series_id = SERIES_IDS.get(series_raw)
+        if series_id is None:
+            continue
+        # Normalise name
+        op = op_raw.translate(_OP_TT).decode("ascii")  # Create, Each All, …
+        time_val = int(time_raw)
+        _trace("%s - %s: %d ns", op, SERIES_NAMES[series_id], time_val)
+        op_id = op_index.get(op, -1)
+        if op_id >= 0:
+            table[series_id][op_id] = time_val
+
+    _trace("Matched %d benchmark results in %s", len(matches), path)
+    return table
+
+def write_parsed(table, path=PARSED_JSON):
+    # Write a temp file and rename it over path, so an interrupted run never
+    # leaves a truncated parsed.json behind for out.py to trust.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"ops": ordered_ops, "series": SERIES_NAMES, "table": table}, f)
+    os.replace(tmp_path, path)
+    _trace("%s saved.", path)
+
+if __name__ == "__main__":
+    write_parsed(parse_table())